@@ -0,0 +1,104 @@
+# backend/bench_record_decoding.py
+# Benchmarks the agents' old read path (full documents -> doc.to_dict()) against the new one
+# (select()-projected documents -> __slots__ records with interned location IDs).
+# Runs offline: snapshots are simulated in memory, mimicking DocumentSnapshot, which deep-copies
+# data in both to_dict() and get(). Usage: python bench_record_decoding.py [docs_per_cycle] [cycles]
+
+import copy
+import datetime
+import random
+import sys
+import time
+import tracemalloc
+
+from firestore_records import (
+    THREAT_CROWD_FIELDS, SENTIMENT_POST_FIELDS,
+    decode_crowd_reading, decode_social_post,
+)
+
+LOCATION_NAMES = [
+    "MG Road", "Majestic Bus Stand", "Koramangala 5th Block", "Indiranagar 100 Feet Rd",
+    "Electronic City", "Cubbon Park", "Marathahalli", "Kr puram", "Bhanashankari", "yeswanthpur",
+]
+
+
+class FakeSnapshot:
+    """Stands in for a Firestore DocumentSnapshot holding the given fields."""
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+    def get(self, field):
+        return copy.deepcopy(self._data[field])
+
+
+def make_crowd_doc():
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc),
+        # Build a fresh str per doc, as the Firestore client does when decoding each response
+        'location_name': "".join(random.choice(LOCATION_NAMES)),
+        'latitude': 12.97 + random.uniform(-0.005, 0.005),
+        'longitude': 77.60 + random.uniform(-0.005, 0.005),
+        'simulated_density': round(random.uniform(0.1, 1.0), 2),
+    }
+
+def make_social_doc():
+    location_name = "".join(random.choice(LOCATION_NAMES))
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc),
+        'location_name': location_name,
+        'latitude': 12.97 + random.uniform(-0.001, 0.001),
+        'longitude': 77.60 + random.uniform(-0.001, 0.001),
+        'text_content': f"Too many people near {location_name} today, feels a bit overwhelming. #Bengaluru",
+        'processed': False,
+        'sentiment_score_raw': 'NEUTRAL',
+    }
+
+def project(doc, fields):
+    """What the server sends back for a select(fields) query."""
+    return {field: doc[field] for field in fields if field in doc}
+
+def measure(label, snapshots, decode, cycles):
+    # Latency: best of several cycles, each decoding every snapshot once
+    timings = []
+    for _ in range(cycles):
+        start = time.perf_counter()
+        decoded = [decode(snapshot) for snapshot in snapshots]
+        timings.append(time.perf_counter() - start)
+        del decoded
+
+    # Memory: bytes still allocated while one cycle's decoded results are held
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    decoded = [decode(snapshot) for snapshot in snapshots]
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del decoded
+
+    print(f"  {label:<28} best {min(timings) * 1000:8.2f} ms/cycle   "
+          f"held {(current - baseline) / 1024:9.1f} KiB   peak {(peak - baseline) / 1024:9.1f} KiB")
+
+def run(docs_per_cycle, cycles):
+    random.seed(0)
+    benchmarks = [
+        ("crowd_data", make_crowd_doc, THREAT_CROWD_FIELDS, decode_crowd_reading),
+        ("social_media_feeds", make_social_doc, SENTIMENT_POST_FIELDS, decode_social_post),
+    ]
+    print(f"Decoding {docs_per_cycle} docs per cycle, best of {cycles} cycles")
+    for collection_name, make_doc, fields, decode in benchmarks:
+        docs = [make_doc() for _ in range(docs_per_cycle)]
+        full_snapshots = [FakeSnapshot(doc) for doc in docs]
+        projected_snapshots = [FakeSnapshot(project(doc, fields)) for doc in docs]
+
+        print(f"{collection_name}:")
+        measure("full docs -> to_dict()", full_snapshots, lambda snapshot: snapshot.to_dict(), cycles)
+        measure("select() -> slotted record", projected_snapshots, decode, cycles)
+
+if __name__ == "__main__":
+    docs_per_cycle = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    run(docs_per_cycle, cycles)
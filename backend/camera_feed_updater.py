@@ -5,10 +5,16 @@
 import time
 import random
 import base64
+import hashlib # For content-addressing generated images
+import io
+from concurrent.futures import ThreadPoolExecutor # Worker pool for image encoding
 import requests # Needed for direct Imagen API calls
+from PIL import Image # For resizing/re-encoding Imagen output into web-friendly variants
 from firestore_connector import db # Import Firestore client
 from firebase_admin import firestore # Required for firestore.SERVER_TIMESTAMP
+from firestore_records import CAMERA_ALERT_FIELDS, decode_alert_record # Projected, slotted alert records
 from google.cloud import storage # For uploading images to Firebase Storage
+from google.api_core.exceptions import PreconditionFailed # Raised when a content-addressed blob already exists
 
 # --- NEW/UPDATED IMPORTS FOR CREDENTIALS ---
 from google.oauth2 import service_account # For explicitly loading service account credentials
@@ -78,24 +84,142 @@ IMAGE_GEN_COOLDOWN_SECONDS = 60 * 1 # Generate new image every 1 minute (reduced
 
 last_image_gen_time = 0
 
-def upload_image_to_storage(image_bytes, destination_blob_name):
-    """Uploads a base64 decoded image to Firebase Storage."""
+# Resolutions the raw Imagen PNG is re-encoded into. Widths are maximums; the aspect
+# ratio is preserved and images are never upscaled. None means "keep original size".
+IMAGE_VARIANT_WIDTHS = {
+    'thumbnail': 320,
+    'panel': 800,
+    'full': None,
+}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85 # Used for the full-size JPEG fallback kept in 'image_url'
+
+# Blob names are derived from the image hash, so a given object never changes once
+# written and browsers/CDNs can cache it for a year without revalidating.
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Pillow releases the GIL while encoding and the Storage calls are network-bound, so a small
+# thread pool encodes and uploads all variants in parallel.
+image_encode_pool = ThreadPoolExecutor(max_workers=len(IMAGE_VARIANT_WIDTHS) + 1)
+
+def variant_size(width, height, max_width):
+    """Returns the (width, height) a variant ends up with: downsized to max_width, never upscaled."""
+    if max_width and width > max_width:
+        return max_width, round(height * max_width / width)
+    return width, height
+
+def encode_image_variant(image_bytes, max_width, image_format):
+    """
+    Decodes the raw image, downsizes it to max_width (if given) and re-encodes it.
+    Returns the encoded bytes.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert('RGB') # WebP/JPEG don't need the alpha channel of the Imagen PNG
+        size = variant_size(img.width, img.height, max_width)
+        if size != img.size:
+            img = img.resize(size, Image.LANCZOS)
+        out = io.BytesIO()
+        if image_format == 'WEBP':
+            img.save(out, format='WEBP', quality=WEBP_QUALITY, method=4)
+        else:
+            img.save(out, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+
+def upload_image_to_storage(image_bytes, destination_blob_name, content_type='image/png'):
+    """
+    Uploads a publicly readable image to Firebase Storage with long-lived Cache-Control headers,
+    in a single request. Blob names are content-addressed, so if the blob already exists the
+    upload is refused by Storage and the existing blob's URL is returned.
+    """
     if not bucket:
         print("Firebase Storage bucket not configured or invalid. Cannot upload image.")
         return None
+    blob = bucket.blob(destination_blob_name)
+    blob.cache_control = IMAGE_CACHE_CONTROL
     try:
-        blob = bucket.blob(destination_blob_name)
+        # if_generation_match=0 only succeeds if the blob doesn't exist yet, and predefined_acl
+        # makes it public as part of the same upload (no separate make_public() call).
         # Set content type to ensure it's served correctly by browser
-        blob.upload_from_string(image_bytes, content_type='image/png') 
-        blob.make_public() # Make the image publicly accessible
+        blob.upload_from_string(image_bytes, content_type=content_type,
+                                if_generation_match=0, predefined_acl='publicRead')
         print(f"Image uploaded to: {blob.public_url}")
         return blob.public_url
+    except PreconditionFailed:
+        # Same hash means same bytes, uploaded (and made public) by an earlier run
+        print(f"Image already in Storage, skipping upload: {blob.public_url}")
+        return blob.public_url
     except Exception as e:
         print(f"Error uploading image to Storage: {e}")
         return None
 
+def encode_and_upload_variant(image_bytes, max_width, image_format, blob_name, content_type):
+    """
+    Encodes one variant and uploads it. Runs in image_encode_pool.
+    Returns the public URL, or None if the upload failed.
+    """
+    encoded = encode_image_variant(image_bytes, max_width, image_format)
+    return upload_image_to_storage(encoded, blob_name, content_type=content_type)
+
+def upload_image_variants(image_bytes):
+    """
+    Encodes the raw Imagen output into WebP variants (thumbnail, panel, full) plus a
+    full-size JPEG fallback, and uploads them content-addressed by hash. Each variant is
+    encoded and uploaded in its own worker, so the network calls don't run one after another.
+    If every variant for this hash is already in Storage, nothing is encoded or uploaded.
+    Returns a dict of {'image_url': <full JPEG url>, 'image_variants': {name: {url, width, height}}},
+    or None if any upload failed.
+    """
+    if not bucket:
+        print("Firebase Storage bucket not configured or invalid. Cannot upload image.")
+        return None
+
+    image_hash = hashlib.sha256(image_bytes).hexdigest()
+    blob_prefix = f"camera_feeds/{image_hash}"
+    blob_names = {name: f"{blob_prefix}/{name}.webp" for name in IMAGE_VARIANT_WIDTHS}
+    fallback_blob_name = f"{blob_prefix}/full.jpg"
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        width, height = img.size # Only reads the header; no full decode
+
+    try:
+        # One listing call tells us whether an earlier run already stored this exact image
+        existing = {blob.name for blob in bucket.list_blobs(prefix=f"{blob_prefix}/")}
+    except Exception as e:
+        print(f"Error listing existing image variants in Storage: {e}")
+        existing = set()
+
+    if existing >= {fallback_blob_name, *blob_names.values()}:
+        print(f"All image variants already in Storage for {image_hash[:12]}, skipping encode/upload.")
+        urls = {name: bucket.blob(blob_name).public_url for name, blob_name in blob_names.items()}
+        fallback_url = bucket.blob(fallback_blob_name).public_url
+    else:
+        webp_jobs = {
+            name: image_encode_pool.submit(
+                encode_and_upload_variant, image_bytes, IMAGE_VARIANT_WIDTHS[name], 'WEBP',
+                blob_name, 'image/webp',
+            )
+            for name, blob_name in blob_names.items()
+        }
+        jpeg_job = image_encode_pool.submit(
+            encode_and_upload_variant, image_bytes, None, 'JPEG', fallback_blob_name, 'image/jpeg',
+        )
+        urls = {name: job.result() for name, job in webp_jobs.items()}
+        fallback_url = jpeg_job.result()
+        if not fallback_url or not all(urls.values()):
+            return None
+
+    image_variants = {}
+    for name, url in urls.items():
+        variant_width, variant_height = variant_size(width, height, IMAGE_VARIANT_WIDTHS[name])
+        image_variants[name] = {'url': url, 'width': variant_width, 'height': variant_height}
+
+    return {'image_url': fallback_url, 'image_variants': image_variants}
+
 def generate_scene_image(prompt_text, location_name="Bengaluru"):
-    """Generates an image using Imagen 3.0 based on a prompt and uploads it."""
+    """
+    Generates an image using Imagen 3.0 based on a prompt and uploads it in several resolutions.
+    Returns the dict from upload_image_variants(), or None if nothing was generated.
+    """
     global last_image_gen_time
     current_time = time.time()
 
@@ -107,7 +231,7 @@ def generate_scene_image(prompt_text, location_name="Bengaluru"):
         print("GEMINI_API_KEY not found. Skipping image generation.")
         return None
     
-    print(f"Generating image for: '{prompt_text}'...")
+    print(f"Generating image for {location_name}: '{prompt_text}'...")
     try:
         api_key = os.getenv("GEMINI_API_KEY")
         # The Imagen API endpoint is different from the text models sometimes
@@ -126,10 +250,9 @@ def generate_scene_image(prompt_text, location_name="Bengaluru"):
             base64_image = result["predictions"][0]["bytesBase64Encoded"]
             image_bytes = base64.b64decode(base64_image)
             
-            blob_name = f"camera_feeds/{location_name.replace(' ', '_').lower()}_{int(time.time())}.png"
-            public_url = upload_image_to_storage(image_bytes, blob_name)
+            image_urls = upload_image_variants(image_bytes)
             last_image_gen_time = current_time # Update last generation time
-            return public_url
+            return image_urls
         else:
             print("No image data found in Imagen API response.")
             print(f"Imagen API Response: {result}") # Log full response for debugging
@@ -153,42 +276,44 @@ def update_camera_feed_based_on_alerts():
         # The UserWarning "Detected filter using positional arguments" is harmless but can be removed
         # by using the 'filter' keyword argument as suggested by the warning.
         # Example: .where(filter=FieldFilter('threat_level', '==', 'HIGH'))
-        docs = db.collection('threat_alerts').where('threat_level', '==', 'HIGH').order_by('timestamp', direction=firestore.Query.DESCENDING).limit(1).stream()
+        docs = db.collection('threat_alerts').select(CAMERA_ALERT_FIELDS).where('threat_level', '==', 'HIGH').order_by('timestamp', direction=firestore.Query.DESCENDING).limit(1).stream()
         for doc in docs:
-            latest_high_alert = doc.to_dict()
+            latest_high_alert = decode_alert_record(doc)
             break # Get only the first (latest) one
         
         # Check if the latest high alert is still "active" (e.g., within the last 5 minutes)
-        if latest_high_alert and (time.time() - latest_high_alert['timestamp'].timestamp()) < (60 * 5): # Alert is less than 5 mins old
-            prompt_for_image = f"A very crowded street scene in Bengaluru near {latest_high_alert['location_name']}, showing signs of high density, realistic photo, urban environment, daytime."
-            if latest_high_alert.get('details') and "extremely dense" in latest_high_alert['details']:
-                prompt_for_image = f"An extremely dense crowd forming in Bengaluru near {latest_high_alert['location_name']}, people looking anxious or confused, realistic photo, urban environment, daytime, wide angle."
+        if latest_high_alert and (time.time() - latest_high_alert.timestamp.timestamp()) < (60 * 5): # Alert is less than 5 mins old
+            prompt_for_image = f"A very crowded street scene in Bengaluru near {latest_high_alert.location_name}, showing signs of high density, realistic photo, urban environment, daytime."
+            if "extremely dense" in latest_high_alert.details:
+                prompt_for_image = f"An extremely dense crowd forming in Bengaluru near {latest_high_alert.location_name}, people looking anxious or confused, realistic photo, urban environment, daytime, wide angle."
             
-            print(f"Detected HIGH alert at {latest_high_alert['location_name']}. Triggering image generation...")
-            image_url = generate_scene_image(prompt_for_image, latest_high_alert['location_name'])
+            print(f"Detected HIGH alert at {latest_high_alert.location_name}. Triggering image generation...")
+            image_urls = generate_scene_image(prompt_for_image, latest_high_alert.location_name)
             
-            if image_url:
+            if image_urls:
                 # Update a fixed camera feed document that frontend listens to
                 camera_feed_data = {
                     'timestamp': firestore.SERVER_TIMESTAMP,
-                    'image_url': image_url,
-                    'location_name': latest_high_alert['location_name'],
-                    'alert_level': latest_high_alert['threat_level'],
-                    'details': latest_high_alert['details']
+                    'image_url': image_urls['image_url'],
+                    'image_variants': image_urls['image_variants'], # Clients pick the smallest variant that fits
+                    'location_name': latest_high_alert.location_name,
+                    'alert_level': latest_high_alert.threat_level,
+                    'details': latest_high_alert.details
                 }
                 db.collection('camera_feeds').document(CAMERA_FEED_DOC_ID).set(camera_feed_data, merge=True)
-                print(f"Updated camera feed with AI-generated image for HIGH alert at {latest_high_alert['location_name']}.")
+                print(f"Updated camera feed with AI-generated image for HIGH alert at {latest_high_alert.location_name}.")
             else:
-                print(f"Failed to generate or upload image for {latest_high_alert['location_name']}.")
+                print(f"Failed to generate or upload image for {latest_high_alert.location_name}.")
         else:
             # No recent HIGH alert, generate a normal scene
             print("No recent HIGH alerts. Generating a default 'normal' city scene.")
             default_prompt = "A normal, moderately busy street scene in Bengaluru, sunny day, people walking casually, urban environment, daytime."
-            image_url = generate_scene_image(default_prompt, "Bengaluru City")
-            if image_url:
+            image_urls = generate_scene_image(default_prompt, "Bengaluru City")
+            if image_urls:
                 camera_feed_data = {
                     'timestamp': firestore.SERVER_TIMESTAMP,
-                    'image_url': image_url,
+                    'image_url': image_urls['image_url'],
+                    'image_variants': image_urls['image_variants'], # Clients pick the smallest variant that fits
                     'location_name': "Bengaluru City (Normal)",
                     'alert_level': "LOW",
                     'details': "Normal city activity."
@@ -209,8 +334,9 @@ if __name__ == "__main__":
         import requests
         from google.cloud import storage # Explicitly import to check
         from google.oauth2 import service_account # Explicitly import for credentials
+        from PIL import Image # Explicitly import for image variant encoding
     except ImportError as ie:
-        print(f"Missing library: {ie}. Please install it: pip install requests google-cloud-storage google-auth-oauthlib") # Added google-auth-oauthlib
+        print(f"Missing library: {ie}. Please install it: pip install requests google-cloud-storage google-auth-oauthlib Pillow") # Added google-auth-oauthlib
         exit()
     
     while True:
@@ -8,6 +8,10 @@ import google.generativeai as genai
 from firestore_connector import db # Import Firestore client
 from firebase_admin import firestore # Required for firestore.SERVER_TIMESTAMP
 from google.cloud.firestore import FieldFilter
+from firestore_records import (
+    INSIGHTS_CROWD_FIELDS, INSIGHTS_SENTIMENT_FIELDS, INSIGHTS_ALERT_FIELDS,
+    decode_crowd_reading, decode_sentiment_record, decode_alert_record,
+)
 import os
 from dotenv import load_dotenv
 
@@ -22,9 +26,10 @@ genai.configure(
 # Define the Gemini model to use for insights generation
 GEMINI_INSIGHTS_MODEL = 'gemini-2.0-flash' # Use the flash model for speed and cost-efficiency
 
-def get_recent_data(collection_name, limit=20, time_window_minutes=60):
+def get_recent_data(collection_name, fields, decode, limit=20, time_window_minutes=60):
     """
     Fetches recent data from a specified Firestore collection within a time window.
+    Only the given fields are requested, and each document is turned into a record by decode().
     """
     # Calculate the timestamp for the start of the time window
     cutoff_timestamp = firestore.SERVER_TIMESTAMP # Placeholder, will be replaced by actual timestamp when querying
@@ -34,13 +39,14 @@ def get_recent_data(collection_name, limit=20, time_window_minutes=60):
     # For hackathon simplicity, we'll just fetch a limit and assume it's recent enough.
     # A more robust solution would involve client-side timestamps or server-side functions.
     
-    docs = db.collection(collection_name).order_by('timestamp', direction=firestore.Query.DESCENDING).limit(limit).stream()
+    docs = db.collection(collection_name).select(fields).order_by('timestamp', direction=firestore.Query.DESCENDING).limit(limit).stream()
     recent_data = []
+    now = time.time()
     for doc in docs:
-        data = doc.to_dict()
+        record = decode(doc)
         # Basic check for data freshness (optional, but good practice)
-        if data.get('timestamp') and (time.time() - data['timestamp'].timestamp()) / 60 < time_window_minutes:
-            recent_data.append(data)
+        if record.timestamp and (now - record.timestamp.timestamp()) / 60 < time_window_minutes:
+            recent_data.append(record)
     return recent_data
 
 def generate_city_insights():
@@ -50,14 +56,14 @@ def generate_city_insights():
     print("Generating new city insights...")
     
     # Fetch recent data from various collections
-    recent_crowd = get_recent_data('crowd_data', limit=50)
-    recent_sentiment = get_recent_data('sentiment_data', limit=50)
-    recent_alerts = get_recent_data('threat_alerts', limit=10)
+    recent_crowd = get_recent_data('crowd_data', INSIGHTS_CROWD_FIELDS, decode_crowd_reading, limit=50)
+    recent_sentiment = get_recent_data('sentiment_data', INSIGHTS_SENTIMENT_FIELDS, decode_sentiment_record, limit=50)
+    recent_alerts = get_recent_data('threat_alerts', INSIGHTS_ALERT_FIELDS, decode_alert_record, limit=10)
 
     # Prepare data for Gemini prompt
-    crowd_summary = "\n".join([f"- {d['location_name']}: Density {d['simulated_density']:.2f} at {d['timestamp'].strftime('%H:%M')}" for d in recent_crowd]) if recent_crowd else "No recent crowd data."
-    sentiment_summary = "\n".join([f"- {d['location_name']}: {d['sentiment_score']} ('{d['text_content'][:50]}...') at {d['timestamp'].strftime('%H:%M')}" for d in recent_sentiment]) if recent_sentiment else "No recent sentiment data."
-    alerts_summary = "\n".join([f"- {d['threat_type']} at {d['location_name']} (Level: {d['threat_level']}): {d['details']}" for d in recent_alerts]) if recent_alerts else "No recent alerts."
+    crowd_summary = "\n".join([f"- {d.location_name}: Density {d.density:.2f} at {d.timestamp.strftime('%H:%M')}" for d in recent_crowd]) if recent_crowd else "No recent crowd data."
+    sentiment_summary = "\n".join([f"- {d.location_name}: {d.sentiment_score} ('{d.text_content[:50]}...') at {d.timestamp.strftime('%H:%M')}" for d in recent_sentiment]) if recent_sentiment else "No recent sentiment data."
+    alerts_summary = "\n".join([f"- {d.threat_type} at {d.location_name} (Level: {d.threat_level}): {d.details}" for d in recent_alerts]) if recent_alerts else "No recent alerts."
 
     # Construct the prompt for Gemini
     prompt = f"""
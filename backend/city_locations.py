@@ -0,0 +1,16 @@
+# backend/city_locations.py
+# Known Bengaluru locations shared by the simulators and the ingest gateway.
+# Coordinates are approximate centre points for each area.
+
+bengaluru_locations = {
+    "MG Road": {"lat": 12.9750, "lon": 77.6090},
+    "Majestic Bus Stand": {"lat": 12.9774, "lon": 77.5700},
+    "Koramangala 5th Block": {"lat": 12.9345, "lon": 77.6180},
+    "Indiranagar 100 Feet Rd": {"lat": 12.9700, "lon": 77.6400},
+    "Electronic City": {"lat": 12.8468, "lon": 77.6601},
+    "Cubbon Park": {"lat": 12.9758, "lon": 77.5922},
+    "Marathahalli": {"lat": 12.9569, "lon": 77.7011},
+    "Kr puram": {"lat": 13.0170, "lon": 77.7044},
+    "Bhanashankari": {"lat": 12.9255, "lon": 77.5468},
+    "yeswanthpur": {"lat": 13.0250, "lon": 77.5340},
+}
@@ -0,0 +1,146 @@
+# backend/firestore_records.py
+# Compact record types for the documents the agents read in their polling loops.
+# Queries project only the fields each consumer uses (via select()), and each snapshot is
+# decoded straight into a __slots__ dataclass instead of a full per-document dict.
+# Location names are interned to small integer IDs so hot-loop dicts key on ints.
+# This module only touches snapshot objects, so it has no Firebase import of its own.
+
+from dataclasses import dataclass
+
+# Fields each consumer actually reads. Pass these to query.select(...) before .stream().
+# Fields left out decode to the record's default (None for timestamps and coordinates).
+THREAT_CROWD_FIELDS = ['location_name', 'latitude', 'longitude', 'simulated_density'] # threat_detection_agent
+INSIGHTS_CROWD_FIELDS = ['timestamp', 'location_name', 'simulated_density'] # city_insights_agent
+INSIGHTS_SENTIMENT_FIELDS = ['timestamp', 'location_name', 'text_content', 'sentiment_score'] # city_insights_agent
+INSIGHTS_ALERT_FIELDS = ['timestamp', 'location_name', 'threat_type', 'threat_level', 'details'] # city_insights_agent
+CAMERA_ALERT_FIELDS = ['timestamp', 'location_name', 'threat_level', 'details'] # camera_feed_updater
+SENTIMENT_POST_FIELDS = ['timestamp', 'location_name', 'latitude', 'longitude', 'text_content'] # sentiment_agent
+
+
+class LocationTable:
+    """
+    Interns location names to small integer IDs (0, 1, 2, ...) for the lifetime of the process.
+    """
+    __slots__ = ('_ids', '_names')
+
+    def __init__(self):
+        self._ids = {}
+        self._names = []
+
+    def intern(self, name):
+        """Returns the ID for a location name, assigning the next free ID if it's new."""
+        location_id = self._ids.get(name)
+        if location_id is None:
+            location_id = len(self._names)
+            self._ids[name] = location_id
+            self._names.append(name)
+        return location_id
+
+    def name(self, location_id):
+        """Returns the location name for a previously interned ID."""
+        return self._names[location_id]
+
+    def __len__(self):
+        return len(self._names)
+
+
+# Shared table so IDs are consistent across every decoder in the process.
+locations = LocationTable()
+
+
+@dataclass(slots=True)
+class CrowdReading:
+    timestamp: object
+    location_id: int | None # None if the reading has no location_name
+    latitude: float
+    longitude: float
+    density: float
+
+    @property
+    def location_name(self):
+        return None if self.location_id is None else locations.name(self.location_id)
+
+
+@dataclass(slots=True)
+class SentimentRecord:
+    timestamp: object
+    location_id: int
+    text_content: str
+    sentiment_score: str
+
+    @property
+    def location_name(self):
+        return locations.name(self.location_id)
+
+
+@dataclass(slots=True)
+class AlertRecord:
+    timestamp: object
+    location_id: int
+    threat_type: str
+    threat_level: str
+    details: str
+
+    @property
+    def location_name(self):
+        return locations.name(self.location_id)
+
+
+@dataclass(slots=True)
+class SocialPost:
+    timestamp: object
+    location_id: int
+    latitude: float
+    longitude: float
+    text_content: str
+
+    @property
+    def location_name(self):
+        return locations.name(self.location_id)
+
+
+# --- Decoders: one DocumentSnapshot in, one record out ---
+# snapshot.get() reads a single field without building the whole document dict.
+
+def _field(snapshot, field, default=None):
+    try:
+        value = snapshot.get(field)
+    except KeyError:
+        return default
+    return default if value is None else value
+
+def decode_crowd_reading(snapshot):
+    location_name = _field(snapshot, 'location_name')
+    return CrowdReading(
+        _field(snapshot, 'timestamp'),
+        locations.intern(location_name) if location_name else None,
+        _field(snapshot, 'latitude'),
+        _field(snapshot, 'longitude'),
+        _field(snapshot, 'simulated_density', 0),
+    )
+
+def decode_sentiment_record(snapshot):
+    return SentimentRecord(
+        _field(snapshot, 'timestamp'),
+        locations.intern(_field(snapshot, 'location_name', 'Unknown')),
+        _field(snapshot, 'text_content', ''),
+        _field(snapshot, 'sentiment_score', 'NEUTRAL'),
+    )
+
+def decode_alert_record(snapshot):
+    return AlertRecord(
+        _field(snapshot, 'timestamp'),
+        locations.intern(_field(snapshot, 'location_name', 'Unknown')),
+        _field(snapshot, 'threat_type', ''),
+        _field(snapshot, 'threat_level', 'LOW'),
+        _field(snapshot, 'details', ''),
+    )
+
+def decode_social_post(snapshot):
+    return SocialPost(
+        _field(snapshot, 'timestamp'),
+        locations.intern(_field(snapshot, 'location_name', 'Unknown')),
+        _field(snapshot, 'latitude'),
+        _field(snapshot, 'longitude'),
+        _field(snapshot, 'text_content', ''),
+    )
@@ -0,0 +1,321 @@
+# backend/firestore_spool.py
+# Write-ahead local spool for the agents' Firestore writes.
+# Writers append to a local SQLite database (WAL mode) and return immediately; a background
+# drainer thread replays the spooled writes to Firestore in order. Every write carries a doc ID
+# chosen at append time, so replaying a batch after a partial failure never creates duplicates.
+# Writes Firestore rejects outright are moved to a dead_letter table so they can't block the rest.
+# Spool depth and drain rate are printed periodically and can be read from another process:
+#   python firestore_spool.py spool/threat_alerts.sqlite3
+# Once the cause is fixed, dead-lettered writes can be put back into the spool with:
+#   python firestore_spool.py requeue spool/threat_alerts.sqlite3
+
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from google.api_core import exceptions as google_exceptions # Firestore error types
+from firestore_connector import db # Import Firestore client
+from firebase_admin import firestore # Required for firestore.SERVER_TIMESTAMP
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SPOOL_DIR = os.getenv("SPOOL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "spool"))
+SPOOL_DRAIN_BATCH_SIZE = 500 # Max writes in a single Firestore batch commit
+SPOOL_IDLE_POLL_SECONDS = 0.5 # How often the drainer checks an empty spool
+SPOOL_RETRY_MAX_DELAY_SECONDS = 30
+SPOOL_STATS_INTERVAL_SECONDS = int(os.getenv("SPOOL_STATS_INTERVAL_SECONDS", "60"))
+SPOOL_RATE_WINDOW_SECONDS = 10 # Drain rate is docs drained per wall-clock second over windows of this length
+
+# Errors caused by the row itself (bad data, oversized docs) that retrying can never fix.
+# Rows that hit these are moved to the dead_letter table instead of blocking every write
+# queued behind them. Deployment-wide problems such as PermissionDenied (missing IAM role)
+# or FailedPrecondition (missing index) are deliberately not listed: they stay on the
+# normal backoff path so a transient misconfiguration doesn't dead-letter the whole spool.
+NON_RETRYABLE_ERRORS = (
+    google_exceptions.InvalidArgument,
+    TypeError,
+    ValueError,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    op TEXT NOT NULL,          -- 'set' or 'update'
+    payload TEXT NOT NULL,     -- JSON-encoded fields
+    appended_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS spool_collection_doc_id ON spool (collection, doc_id);
+CREATE TABLE IF NOT EXISTS dead_letter (
+    seq INTEGER PRIMARY KEY,   -- seq the row had in the spool
+    collection TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    op TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    appended_at REAL NOT NULL,
+    error TEXT NOT NULL,
+    failed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS spool_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    drained_total INTEGER NOT NULL,
+    drain_rate REAL NOT NULL,
+    last_drain_at REAL
+);
+"""
+
+
+# --- Payload encoding ---
+# Firestore docs here hold plain JSON values plus datetimes and the SERVER_TIMESTAMP sentinel.
+# The sentinel is resolved to the local time of the append, so a reading that sat in the spool
+# during an outage keeps the time it was taken rather than the time it was replayed.
+
+def _encode_value(value, appended_at):
+    if value is firestore.SERVER_TIMESTAMP:
+        return {'__datetime__': appended_at.isoformat()}
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, dict):
+        return {key: _encode_value(item, appended_at) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(item, appended_at) for item in value]
+    return value
+
+def _decode_hook(obj):
+    if len(obj) == 1 and '__datetime__' in obj:
+        return datetime.datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+class FirestoreSpool:
+    """
+    Append-only local spool for one agent's writes, drained to Firestore in order.
+    Call start() once to launch the background drainer.
+    """
+
+    def __init__(self, name, spool_dir=SPOOL_DIR):
+        self.name = name
+        os.makedirs(spool_dir, exist_ok=True)
+        self.path = os.path.join(spool_dir, f"{name}.sqlite3")
+        self._lock = threading.Lock() # One connection shared by the writers and the drainer
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        # WAL + synchronous=NORMAL: each append is a cheap WAL write that survives a process crash,
+        # and fsyncs are batched at checkpoints instead of paid on every append.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._drainer = None
+        # Carry the drain counters over from previous runs of this agent
+        row = self._conn.execute("SELECT drained_total, drain_rate FROM spool_stats WHERE id = 1").fetchone()
+        self.drained_total, self.drain_rate = row or (0, 0.0) # drain_rate: docs/second, smoothed
+        self._last_drain_at = None
+        self._window_started = time.time()
+        self._window_drained = 0
+
+    # --- Writers ---
+
+    def _append(self, collection, doc_id, op, data):
+        now = time.time()
+        appended_at = datetime.datetime.fromtimestamp(now, tz=datetime.timezone.utc)
+        payload = json.dumps(_encode_value(data, appended_at))
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO spool (collection, doc_id, op, payload, appended_at) VALUES (?, ?, ?, ?, ?)",
+                (collection, doc_id, op, payload, now),
+            )
+        return doc_id
+
+    def add(self, collection, data):
+        """Spools the equivalent of collection.add(data). Returns the doc ID the document will get."""
+        return self._append(collection, uuid.uuid4().hex, 'set', data)
+
+    def set(self, collection, doc_id, data):
+        """Spools the equivalent of collection.document(doc_id).set(data)."""
+        return self._append(collection, doc_id, 'set', data)
+
+    def update(self, collection, doc_id, fields):
+        """Spools the equivalent of collection.document(doc_id).update(fields) (replayed as a merge)."""
+        return self._append(collection, doc_id, 'update', fields)
+
+    def is_pending(self, collection, doc_id):
+        """True if a write to this document is still waiting in the spool."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM spool WHERE collection = ? AND doc_id = ? LIMIT 1", (collection, doc_id)
+            ).fetchone()
+        return row is not None
+
+    # --- Drainer ---
+
+    def _commit(self, rows):
+        batch = db.batch()
+        for _, collection, doc_id, op, payload, _ in rows:
+            ref = db.collection(collection).document(doc_id)
+            data = json.loads(payload, object_hook=_decode_hook)
+            if op == 'update':
+                # A merge-set instead of update() so a since-deleted doc can't wedge the spool head
+                batch.set(ref, data, merge=True)
+            else:
+                batch.set(ref, data)
+        batch.commit()
+
+    def _remove(self, rows, dead_rows=()):
+        """Deletes committed rows from the spool and moves (row, error) pairs to dead_letter."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("DELETE FROM spool WHERE seq = ?", [(row[0],) for row in rows])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO dead_letter (seq, collection, doc_id, op, payload, appended_at, error, failed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*row, error, now) for row, error in dead_rows],
+            )
+            self._conn.executemany("DELETE FROM spool WHERE seq = ?", [(row[0],) for row, _ in dead_rows])
+            self._conn.execute("COMMIT")
+        if rows:
+            self.drained_total += len(rows)
+            self._window_drained += len(rows)
+            self._last_drain_at = now
+
+    def _drain_rows_individually(self, rows):
+        """
+        After a batch failed with a non-retryable error, commits the rows one at a time in order
+        so only the offending rows are dead-lettered. Retryable errors propagate as usual.
+        """
+        for row in rows:
+            try:
+                self._commit([row])
+            except NON_RETRYABLE_ERRORS as e:
+                print(f"Moving spooled write {row[0]} ({row[1]}/{row[2]}) to dead_letter: {e}")
+                self._remove([], [(row, repr(e))])
+                continue
+            self._remove([row])
+
+    def drain_once(self):
+        """Replays the oldest spooled writes to Firestore in one batch. Returns how many rows were handled."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, collection, doc_id, op, payload, appended_at FROM spool ORDER BY seq LIMIT ?",
+                (SPOOL_DRAIN_BATCH_SIZE,),
+            ).fetchall()
+        if not rows:
+            return 0
+
+        try:
+            self._commit(rows) # Raises on failure; the rows stay spooled and are retried in order
+        except NON_RETRYABLE_ERRORS:
+            # Batches are all-or-nothing, so find the bad rows by committing one at a time
+            self._drain_rows_individually(rows)
+            return len(rows)
+        self._remove(rows)
+        return len(rows)
+
+    def _update_drain_rate(self):
+        # Docs actually drained per wall-clock second; windows spent idle or failing count too.
+        now = time.time()
+        elapsed = now - self._window_started
+        if elapsed < SPOOL_RATE_WINDOW_SECONDS:
+            return
+        rate = self._window_drained / elapsed
+        self.drain_rate = 0.5 * self.drain_rate + 0.5 * rate
+        self._window_started = now
+        self._window_drained = 0
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO spool_stats (id, drained_total, drain_rate, last_drain_at) VALUES (1, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET drained_total = excluded.drained_total, "
+                "drain_rate = excluded.drain_rate, last_drain_at = COALESCE(excluded.last_drain_at, last_drain_at)",
+                (self.drained_total, self.drain_rate, self._last_drain_at),
+            )
+
+    def _run(self):
+        delay = 1
+        last_stats_print = time.time()
+        while True:
+            try:
+                drained = self.drain_once()
+                delay = 1
+            except Exception as e:
+                print(f"Error draining spool '{self.name}' to Firestore: {e}. Retrying in {delay}s. Depth: {self.depth()}")
+                self._update_drain_rate()
+                time.sleep(delay)
+                delay = min(delay * 2, SPOOL_RETRY_MAX_DELAY_SECONDS)
+                continue
+
+            self._update_drain_rate()
+            if time.time() - last_stats_print >= SPOOL_STATS_INTERVAL_SECONDS:
+                print(f"Spool '{self.name}' stats: {self.stats()}")
+                last_stats_print = time.time()
+            if not drained:
+                time.sleep(SPOOL_IDLE_POLL_SECONDS)
+
+    def start(self):
+        """Starts the background drainer thread (idempotent)."""
+        if self._drainer is None:
+            self._drainer = threading.Thread(target=self._run, name=f"spool-drainer-{self.name}", daemon=True)
+            self._drainer.start()
+            print(f"Spool '{self.name}' drainer started ({self.path}), {self.depth()} writes pending.")
+
+    # --- Monitoring ---
+
+    def depth(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def stats(self):
+        return read_spool_stats(self._conn, self._lock)
+
+
+def read_spool_stats(conn, lock=None):
+    """Returns spool depth, dead-letter count, oldest pending write age and drain rate for an open spool connection."""
+    with lock or threading.Lock():
+        depth, oldest = conn.execute("SELECT COUNT(*), MIN(appended_at) FROM spool").fetchone()
+        dead_lettered = conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+        drained = conn.execute("SELECT drained_total, drain_rate, last_drain_at FROM spool_stats WHERE id = 1").fetchone()
+    drained_total, drain_rate, last_drain_at = drained or (0, 0.0, None)
+    now = time.time()
+    return {
+        'depth': depth,
+        'oldest_pending_age_sec': round(now - oldest, 1) if oldest else 0.0,
+        'drain_rate_per_sec': round(drain_rate, 1),
+        'drained_total': drained_total,
+        'dead_lettered': dead_lettered,
+        'last_drain_age_sec': round(now - last_drain_at, 1) if last_drain_at else None,
+    }
+
+def requeue_dead_letters(conn):
+    """
+    Moves every dead-lettered write back into the spool under its original seq, so the
+    drainer replays it in its original order relative to anything still pending.
+    Returns how many writes were requeued.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    count = conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+    conn.execute(
+        "INSERT INTO spool (seq, collection, doc_id, op, payload, appended_at) "
+        "SELECT seq, collection, doc_id, op, payload, appended_at FROM dead_letter"
+    )
+    conn.execute("DELETE FROM dead_letter")
+    conn.execute("COMMIT")
+    return count
+
+# Main execution block: print the stats of a spool file (e.g. from a monitoring cron job),
+# or requeue its dead-lettered writes.
+if __name__ == "__main__":
+    if len(sys.argv) == 2:
+        conn = sqlite3.connect(f"file:{sys.argv[1]}?mode=ro", uri=True)
+        print(json.dumps(read_spool_stats(conn)))
+    elif len(sys.argv) == 3 and sys.argv[1] == 'requeue':
+        # isolation_level=None so the explicit BEGIN/COMMIT above control the transaction
+        conn = sqlite3.connect(sys.argv[2], timeout=30, isolation_level=None)
+        print(f"Requeued {requeue_dead_letters(conn)} dead-lettered writes.")
+    else:
+        print("Usage: python firestore_spool.py <path/to/spool.sqlite3>")
+        print("       python firestore_spool.py requeue <path/to/spool.sqlite3>")
+        sys.exit(1)
@@ -0,0 +1,343 @@
+# backend/ingest_gateway.py
+# Asyncio HTTP ingest service for real crowd counters and social feed scrapers.
+# Producers POST NDJSON batches (one JSON object per line). Each record is validated against
+# the same schema the simulators write, attached to the nearest known location, and queued.
+# Writer tasks drain the bounded queues into Firestore with batched commits.
+# When the queues are full (Firestore is lagging) the gateway answers 429 with Retry-After.
+#
+# Endpoints:
+#   POST /ingest/crowd   - crowd readings -> 'crowd_data'
+#   POST /ingest/posts   - social posts   -> 'social_media_feeds'
+#   GET  /health         - queue depths and drain rates
+
+import asyncio
+import datetime
+import json
+import math
+import os
+import time
+from aiohttp import web # Async HTTP server
+from google.api_core import exceptions as google_exceptions # Firestore error types
+from firestore_connector import db # Import Firestore client
+from city_locations import bengaluru_locations # Same locations the simulators use
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INGEST_HOST = os.getenv("INGEST_HOST", "0.0.0.0")
+INGEST_PORT = int(os.getenv("INGEST_PORT", "8080"))
+INGEST_QUEUE_MAXSIZE = int(os.getenv("INGEST_QUEUE_MAXSIZE", "5000")) # Per collection, in records
+INGEST_MAX_BODY_BYTES = int(os.getenv("INGEST_MAX_BODY_BYTES", str(1024 * 1024)))
+INGEST_WRITER_TASKS = int(os.getenv("INGEST_WRITER_TASKS", "2")) # Concurrent batch commits per collection
+SNAP_RADIUS_KM = float(os.getenv("INGEST_SNAP_RADIUS_KM", "3.0")) # Farther than this from every known location is rejected
+
+FIRESTORE_BATCH_LIMIT = 500 # Max writes in a single Firestore batch commit
+WRITE_RETRY_MAX_DELAY_SECONDS = 30
+DRAIN_RATE_WINDOW_SECONDS = 5 # Drain rate is sampled over wall-clock windows of this length
+SHUTDOWN_DRAIN_TIMEOUT_SECONDS = float(os.getenv("INGEST_SHUTDOWN_DRAIN_TIMEOUT_SECONDS", "30"))
+MAX_POST_LENGTH = 1000
+MAX_RETRY_AFTER_SECONDS = 60
+
+# Errors caused by one bad document rather than by Firestore being unavailable. Retrying the
+# same batch can never succeed, so it's split and only the offending documents are dropped.
+NON_RETRYABLE_WRITE_ERRORS = (google_exceptions.InvalidArgument, TypeError, ValueError)
+
+
+class ValidationError(ValueError):
+    """Raised for an NDJSON record that doesn't match the simulator schema."""
+
+
+def snap_to_location(latitude, longitude):
+    """
+    Returns the name of the known location closest to the given coordinates,
+    or raises ValidationError if none is within SNAP_RADIUS_KM.
+    """
+    best_name, best_km = None, None
+    for name, coords in bengaluru_locations.items():
+        # Equirectangular approximation is plenty accurate at city scale
+        dx = math.radians(longitude - coords['lon']) * math.cos(math.radians((latitude + coords['lat']) / 2))
+        dy = math.radians(latitude - coords['lat'])
+        km = 6371.0 * math.hypot(dx, dy)
+        if best_km is None or km < best_km:
+            best_name, best_km = name, km
+    if best_km > SNAP_RADIUS_KM:
+        raise ValidationError(f"coordinates are {best_km:.1f} km from the nearest known location")
+    return best_name
+
+def _require_number(record, field, low=None, high=None):
+    value = record.get(field)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValidationError(f"'{field}' must be a number")
+    try:
+        value = float(value) # Huge JSON integers overflow here rather than in the range check
+    except OverflowError:
+        raise ValidationError(f"'{field}' is out of range")
+    if not math.isfinite(value):
+        raise ValidationError(f"'{field}' must be a finite number")
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise ValidationError(f"'{field}' must be between {low} and {high}")
+    return value
+
+def _require_coordinates(record):
+    latitude = _require_number(record, 'latitude', -90, 90)
+    longitude = _require_number(record, 'longitude', -180, 180)
+    return latitude, longitude
+
+def _received_at():
+    # Stamped when the record is accepted, not when it's committed, so readings that wait in
+    # the queue (or through commit retries) keep the time they arrived.
+    return datetime.datetime.now(datetime.timezone.utc)
+
+def validate_crowd_reading(record):
+    """Validates a crowd reading and returns the document to write (see sim_crowd_generator.py)."""
+    latitude, longitude = _require_coordinates(record)
+    return {
+        'timestamp': _received_at(),
+        'location_name': snap_to_location(latitude, longitude),
+        'latitude': latitude,
+        'longitude': longitude,
+        'simulated_density': round(_require_number(record, 'simulated_density', 0.0, 1.0), 2),
+    }
+
+def validate_social_post(record):
+    """Validates a social post and returns the document to write (see sim_social_media_generator.py)."""
+    latitude, longitude = _require_coordinates(record)
+    text_content = record.get('text_content')
+    if not isinstance(text_content, str) or not text_content.strip():
+        raise ValidationError("'text_content' must be a non-empty string")
+    if len(text_content) > MAX_POST_LENGTH:
+        raise ValidationError(f"'text_content' must be at most {MAX_POST_LENGTH} characters")
+    try:
+        text_content.encode('utf-8') # json.loads lets lone surrogates like "\ud800" through
+    except UnicodeEncodeError:
+        raise ValidationError("'text_content' must be valid Unicode text")
+    return {
+        'timestamp': _received_at(),
+        'location_name': snap_to_location(latitude, longitude),
+        'latitude': latitude,
+        'longitude': longitude,
+        'text_content': text_content,
+        'processed': False, # Picked up by sentiment_agent.py
+    }
+
+
+class CollectionWriter:
+    """
+    Bounded queue of validated documents for one collection, drained by writer tasks
+    that commit them to Firestore in batches of up to FIRESTORE_BATCH_LIMIT.
+    """
+
+    def __init__(self, collection_name):
+        self.collection_name = collection_name
+        self.queue = asyncio.Queue(maxsize=INGEST_QUEUE_MAXSIZE)
+        self.written = 0
+        self.in_flight = 0 # Records taken off the queue but not yet committed
+        self.dropped = 0 # Records Firestore rejected outright (see NON_RETRYABLE_WRITE_ERRORS)
+        self.drain_rate = 0.0 # Docs/second across all writer tasks, smoothed over wall-clock windows
+        self._window_started = time.monotonic()
+        self._window_written = 0
+        self._retry_at = None # When a failing commit will next be retried (monotonic clock)
+        self.tasks = []
+
+    def free_slots(self):
+        return self.queue.maxsize - self.queue.qsize()
+
+    def _update_drain_rate(self):
+        # Windows with no successful commits (e.g. while Firestore is failing) count as 0 docs/second,
+        # so the rate decays during an outage instead of sticking at the last healthy value.
+        now = time.monotonic()
+        elapsed = now - self._window_started
+        if elapsed < DRAIN_RATE_WINDOW_SECONDS:
+            return
+        rate = self._window_written / elapsed
+        self.drain_rate = rate if self.drain_rate == 0 else 0.5 * self.drain_rate + 0.5 * rate
+        self._window_started = now
+        self._window_written = 0
+
+    def retry_after_seconds(self, needed):
+        """
+        Estimates how long until `needed` more records would fit, from the recent drain rate.
+        While commits are failing, it's never shorter than the time until the next retry.
+        """
+        self._update_drain_rate()
+        shortfall = needed - self.free_slots()
+        if self.drain_rate <= 0:
+            estimate = MAX_RETRY_AFTER_SECONDS // 4
+        else:
+            estimate = math.ceil(shortfall / self.drain_rate)
+        if self._retry_at is not None:
+            estimate = max(estimate, math.ceil(self._retry_at - time.monotonic()))
+        return max(1, min(MAX_RETRY_AFTER_SECONDS, estimate))
+
+    def enqueue(self, docs):
+        # Callers check free_slots() first, and nothing awaits in between, so this never blocks.
+        # Doc IDs are assigned here, locally and once, so retrying a commit that actually
+        # landed overwrites the same documents instead of writing them twice.
+        collection = db.collection(self.collection_name)
+        for doc in docs:
+            self.queue.put_nowait((collection.document(), doc))
+
+    def _commit(self, items):
+        batch = db.batch()
+        for ref, doc in items:
+            batch.set(ref, doc)
+        batch.commit()
+
+    def _commit_individually(self, pending):
+        """
+        Commits pending items one at a time, removing each from the list once it's handled.
+        Items Firestore rejects outright are dropped; other errors propagate with the
+        remaining items still in `pending`, so the retry picks up where this left off.
+        """
+        while pending:
+            ref, doc = pending[0]
+            try:
+                self._commit([(ref, doc)])
+            except NON_RETRYABLE_WRITE_ERRORS as e:
+                print(f"Dropping record {ref.id} for '{self.collection_name}', rejected by Firestore: {e}")
+                self.dropped += 1
+            pending.pop(0)
+
+    async def _run(self):
+        while True:
+            items = [await self.queue.get()]
+            while len(items) < FIRESTORE_BATCH_LIMIT and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            self.in_flight += len(items)
+            dropped_before = self.dropped
+
+            pending = list(items)
+            split = False # Set once the batch is known to contain a document Firestore won't accept
+            delay = 1
+            while pending:
+                try:
+                    # The Firestore client is synchronous, so commit off the event loop
+                    if split:
+                        await asyncio.to_thread(self._commit_individually, pending)
+                    else:
+                        await asyncio.to_thread(self._commit, pending)
+                        pending = []
+                    self._retry_at = None
+                except NON_RETRYABLE_WRITE_ERRORS as e:
+                    # Batches are all-or-nothing, so find the bad documents by committing one at a time
+                    print(f"Batch of {len(pending)} docs to '{self.collection_name}' rejected: {e}. Committing individually.")
+                    split = True
+                except Exception as e:
+                    # Keep the batch and retry; meanwhile the queue fills up and producers get 429s
+                    print(f"Error committing {len(pending)} docs to '{self.collection_name}': {e}. Retrying in {delay}s.")
+                    self._retry_at = time.monotonic() + delay
+                    self._update_drain_rate()
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, WRITE_RETRY_MAX_DELAY_SECONDS)
+
+            committed = len(items) - (self.dropped - dropped_before)
+            self.in_flight -= len(items)
+            self.written += committed
+            self._window_written += committed
+            self._update_drain_rate()
+            for _ in items:
+                self.queue.task_done()
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._run()) for _ in range(INGEST_WRITER_TASKS)]
+
+    async def stop(self):
+        # Flush what's already been accepted, but don't hang forever if Firestore is unreachable
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=SHUTDOWN_DRAIN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"Shutdown drain of '{self.collection_name}' timed out after {SHUTDOWN_DRAIN_TIMEOUT_SECONDS}s; "
+                  f"{self.queue.qsize() + self.in_flight} accepted records were not written.")
+        for task in self.tasks:
+            task.cancel()
+
+    def stats(self):
+        self._update_drain_rate()
+        return {
+            'queue_depth': self.queue.qsize(),
+            'queue_capacity': self.queue.maxsize,
+            'in_flight': self.in_flight,
+            'retrying': self._retry_at is not None,
+            'drain_rate_per_sec': round(self.drain_rate, 1),
+            'written': self.written,
+            'dropped': self.dropped,
+        }
+
+
+def make_ingest_handler(writer_key, validate):
+    async def handle(request):
+        if request.app['closing'].is_set():
+            # Writers are about to be drained and stopped; don't accept records that can't be written
+            return web.json_response({'error': "ingest gateway is shutting down"}, status=503)
+        writer = request.app['writers'][writer_key]
+        body = await request.text()
+
+        docs, rejected = [], []
+        # NDJSON splits on '\n' only: splitlines() would also split on \x85, \u2028 and \u2029,
+        # which JSON allows raw inside strings (and scraped post text often contains).
+        for line_number, line in enumerate(body.split('\n'), start=1):
+            line = line.removesuffix('\r')
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValidationError("each line must be a JSON object")
+                docs.append(validate(record))
+            except (ValueError, OverflowError, RecursionError) as e:
+                # ValueError covers JSONDecodeError, ValidationError and json's integer digit limit;
+                # RecursionError comes from deeply nested input like [[[[...
+                rejected.append({'line': line_number, 'error': str(e)})
+
+        if not docs:
+            return web.json_response({'accepted': 0, 'rejected': rejected}, status=400)
+        if len(docs) > writer.queue.maxsize:
+            return web.json_response({'error': f"batch exceeds {writer.queue.maxsize} records"}, status=413)
+        if writer.free_slots() < len(docs):
+            # Downstream is lagging: reject the whole batch so the producer can retry it intact
+            retry_after = writer.retry_after_seconds(len(docs))
+            return web.json_response(
+                {'error': "ingest queue full, retry later", 'retry_after': retry_after},
+                status=429,
+                headers={'Retry-After': str(retry_after)},
+            )
+
+        writer.enqueue(docs)
+        return web.json_response({'accepted': len(docs), 'rejected': rejected}, status=202)
+    return handle
+
+async def handle_health(request):
+    return web.json_response({name: writer.stats() for name, writer in request.app['writers'].items()})
+
+async def start_writers(app):
+    for writer in app['writers'].values():
+        writer.start()
+
+async def reject_new_requests(app):
+    app['closing'].set()
+
+async def stop_writers(app):
+    for writer in app['writers'].values():
+        await writer.stop()
+
+def create_app():
+    app = web.Application(client_max_size=INGEST_MAX_BODY_BYTES)
+    app['closing'] = asyncio.Event() # Set on shutdown; the app's own dict is frozen once it starts
+    app['writers'] = {
+        'crowd': CollectionWriter('crowd_data'),
+        'posts': CollectionWriter('social_media_feeds'),
+    }
+    app.router.add_post('/ingest/crowd', make_ingest_handler('crowd', validate_crowd_reading))
+    app.router.add_post('/ingest/posts', make_ingest_handler('posts', validate_social_post))
+    app.router.add_get('/health', handle_health)
+    app.on_startup.append(start_writers)
+    # on_shutdown runs before in-flight handlers finish, so it only stops new requests;
+    # the queues are drained in on_cleanup, after every handler that got a 202 has enqueued.
+    app.on_shutdown.append(reject_new_requests)
+    app.on_cleanup.append(stop_writers)
+    return app
+
+# Main execution block
+if __name__ == "__main__":
+    print(f"Starting ingest gateway on {INGEST_HOST}:{INGEST_PORT}...")
+    web.run_app(create_app(), host=INGEST_HOST, port=INGEST_PORT)
@@ -0,0 +1,98 @@
+# backend/ingest_load_test.py
+# Load-test client for ingest_gateway.py. Several concurrent producers POST NDJSON batches of
+# simulator-shaped records for a fixed duration, honouring 429 Retry-After responses.
+# Reports sustained accepted requests/second, records/second and request latency percentiles.
+# Usage: python ingest_load_test.py --url http://localhost:8080 --concurrency 32 --duration 30
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import aiohttp # Async HTTP client
+from city_locations import bengaluru_locations
+
+mock_posts = [
+    "Too many people near [LOCATION] today, feels a bit overwhelming.",
+    "Traffic is terrible on [LOCATION] today! Stuck for ages. #BengaluruTraffic",
+    "Peaceful morning at [LOCATION]. Feeling calm and refreshed.",
+]
+
+def make_crowd_reading():
+    coords = random.choice(list(bengaluru_locations.values()))
+    return {
+        'latitude': coords['lat'] + random.uniform(-0.005, 0.005),
+        'longitude': coords['lon'] + random.uniform(-0.005, 0.005),
+        'simulated_density': round(random.uniform(0.1, 1.0), 2),
+    }
+
+def make_social_post():
+    location_name, coords = random.choice(list(bengaluru_locations.items()))
+    return {
+        'latitude': coords['lat'] + random.uniform(-0.001, 0.001),
+        'longitude': coords['lon'] + random.uniform(-0.001, 0.001),
+        'text_content': random.choice(mock_posts).replace("[LOCATION]", location_name),
+    }
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+async def producer(session, url, make_record, batch_size, deadline, results):
+    while time.perf_counter() < deadline:
+        body = "\n".join(json.dumps(make_record()) for _ in range(batch_size))
+        started = time.perf_counter()
+        try:
+            async with session.post(url, data=body, headers={'Content-Type': 'application/x-ndjson'}) as response:
+                await response.read()
+                latency = time.perf_counter() - started
+                if response.status == 202:
+                    results['latencies'].append(latency)
+                    results['records'] += batch_size
+                elif response.status == 429:
+                    results['throttled'] += 1
+                    await asyncio.sleep(float(response.headers.get('Retry-After', 1)))
+                else:
+                    results['errors'] += 1
+        except aiohttp.ClientError as e:
+            results['errors'] += 1
+            print(f"Request error: {e}")
+            await asyncio.sleep(1)
+
+async def run(args):
+    endpoint, make_record = {
+        'crowd': ('/ingest/crowd', make_crowd_reading),
+        'posts': ('/ingest/posts', make_social_post),
+    }[args.kind]
+    url = args.url.rstrip('/') + endpoint
+    results = {'latencies': [], 'records': 0, 'throttled': 0, 'errors': 0}
+
+    print(f"Load testing {url}: {args.concurrency} producers x {args.batch_size} records/batch for {args.duration}s...")
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            producer(session, url, make_record, args.batch_size, deadline, results)
+            for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(results['latencies'])
+    print(f"Accepted requests:  {len(latencies)} ({len(latencies) / elapsed:.1f} req/s)")
+    print(f"Accepted records:   {results['records']} ({results['records'] / elapsed:.1f} records/s)")
+    print(f"Throttled (429):    {results['throttled']}")
+    print(f"Errors:             {results['errors']}")
+    print(f"Latency p50 / p99 / max: {percentile(latencies, 50) * 1000:.1f} / "
+          f"{percentile(latencies, 99) * 1000:.1f} / {(latencies[-1] if latencies else 0) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the ingest gateway.")
+    parser.add_argument('--url', default="http://localhost:8080")
+    parser.add_argument('--kind', choices=['crowd', 'posts'], default='crowd')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=30)
+    asyncio.run(run(parser.parse_args()))
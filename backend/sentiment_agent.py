@@ -9,6 +9,8 @@ import google.generativeai as genai # Import the Gemini API library
 from firestore_connector import db # Import the Firestore database client
 from firebase_admin import firestore # Required for firestore.SERVER_TIMESTAMP
 from google.cloud.firestore import FieldFilter # For filtering documents in queries
+from firestore_records import SENTIMENT_POST_FIELDS, decode_social_post # Projected, slotted post records
+from firestore_spool import FirestoreSpool # Local write-ahead spool for sentiment writes
 import os
 from dotenv import load_dotenv # For loading API keys from .env
 
@@ -22,6 +24,13 @@ genai.configure(
     # client_options={"api_endpoint": "us-central1-aiplatform.googleapis.com"} # This was removed as the default endpoint worked
 )
 
+# Writes are appended to a local spool and replayed to Firestore in the background
+spool = FirestoreSpool('sentiment_agent')
+
+SENTIMENT_BATCH_SIZE = 5 # New posts analysed per cycle
+SENTIMENT_PAGE_SIZE = 50 # Posts fetched per query page
+MAX_PENDING_PAGES = 10 # Stop paging past spooled posts after this many pages
+
 def analyze_sentiment(text):
     """
     Analyzes the sentiment of a given text using the Gemini API.
@@ -50,51 +59,81 @@ def analyze_sentiment(text):
         print(f"Full Gemini API Error: {e}") 
         return "ERROR"
 
+def fetch_unprocessed_posts(query, wanted):
+    """
+    Returns up to `wanted` unprocessed posts plus how many were skipped because their
+    'processed' flag is still spooled. While Firestore lags, the first page can be all
+    spooled posts, so it pages past them (up to MAX_PENDING_PAGES pages).
+    """
+    posts, skipped_pending = [], 0
+    last_doc = None
+    for _ in range(MAX_PENDING_PAGES):
+        page_query = query.start_after(last_doc) if last_doc else query
+        page = list(page_query.limit(SENTIMENT_PAGE_SIZE).stream())
+        for doc in page:
+            if spool.is_pending('social_media_feeds', doc.id):
+                skipped_pending += 1
+                continue
+            posts.append(doc)
+            if len(posts) >= wanted:
+                return posts, skipped_pending
+        if len(page) < SENTIMENT_PAGE_SIZE:
+            break
+        last_doc = page[-1]
+    return posts, skipped_pending
+
 def process_social_media_for_sentiment():
     """
     Queries Firestore for unprocessed social media posts, analyzes their sentiment,
     and updates/adds data to Firestore.
     """
     # Query for social media posts where the 'processed' field is False.
-    # We limit to 5 documents per batch to avoid processing too many at once.
-    docs_to_process = db.collection('social_media_feeds').where(filter=FieldFilter("processed", "==", False)).limit(5).stream()
-    
+    # We process at most 5 documents per cycle to avoid processing too many at once.
+    # Only the fields copied into 'sentiment_data' are fetched.
+    query = db.collection('social_media_feeds').select(SENTIMENT_POST_FIELDS).where(filter=FieldFilter("processed", "==", False))
+
+    # skipped_pending: posts already analysed whose 'processed' flag is still in the spool
+    docs_to_process, skipped_pending = fetch_unprocessed_posts(query, SENTIMENT_BATCH_SIZE)
+
     found_unprocessed = False # Flag to check if any documents were found
     for doc in docs_to_process:
         found_unprocessed = True
-        data = doc.to_dict() # Convert Firestore document to a Python dictionary
-        text = data.get('text_content', '') # Get the text content of the post
+        post = decode_social_post(doc) # Decode the projected document into a SocialPost record
+        text = post.text_content # Get the text content of the post
         
         if text: # Only process if text content exists
             sentiment_result = analyze_sentiment(text) # Call Gemini API for sentiment
             
-            # Update the original social media document to mark it as processed
-            # and store the raw sentiment result from Gemini.
-            doc.reference.update({'processed': True, 'sentiment_score_raw': sentiment_result})
-            
             # Create a new entry in the 'sentiment_data' collection.
             # Now including latitude and longitude from the original social_media_feeds document.
             sentiment_data_entry = {
-                'timestamp': data.get('timestamp', firestore.SERVER_TIMESTAMP),
-                'location_name': data.get('location_name', 'Unknown'),
-                'latitude': data.get('latitude'),   # ADDED: Pass latitude
-                'longitude': data.get('longitude'), # ADDED: Pass longitude
+                'timestamp': post.timestamp or firestore.SERVER_TIMESTAMP,
+                'location_name': post.location_name,
+                'latitude': post.latitude,   # ADDED: Pass latitude
+                'longitude': post.longitude, # ADDED: Pass longitude
                 'text_content': text,
                 'sentiment_score': sentiment_result
             }
             try:
-                db.collection('sentiment_data').add(sentiment_data_entry)
+                # Update the original social media document to mark it as processed
+                # and store the raw sentiment result from Gemini.
+                spool.update('social_media_feeds', doc.id, {'processed': True, 'sentiment_score_raw': sentiment_result})
+                # Keyed by the post ID so a replayed write can never produce a duplicate entry
+                spool.set('sentiment_data', doc.id, sentiment_data_entry)
                 print(f"Processed sentiment for post ID {doc.id} ('{text[:50]}...'): {sentiment_result}")
             except Exception as e:
-                print(f"Error adding sentiment data to Firestore: {e}")
+                print(f"Error spooling sentiment data: {e}")
         time.sleep(0.3) # Small delay to avoid hitting API rate limits too quickly, especially for Gemini
 
-    if not found_unprocessed:
+    if skipped_pending:
+        print(f"Skipped {skipped_pending} already-analysed posts still waiting in the spool (depth {spool.depth()}).")
+    if not found_unprocessed and not skipped_pending:
         print("No new social media posts to process for sentiment.")
 
 # Main execution block: This runs when the script is executed directly.
 if __name__ == "__main__":
     print("Starting sentiment analysis agent...")
+    spool.start()
     while True:
         process_social_media_for_sentiment()
         time.sleep(10) # Check for new posts every 10 seconds
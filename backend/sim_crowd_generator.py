@@ -1,23 +1,12 @@
 import time
 import random
-from firestore_connector import db # Import the Firestore database client
 from firebase_admin import firestore # Required for firestore.SERVER_TIMESTAMP
+from city_locations import bengaluru_locations # Shared with the ingest gateway
+from firestore_spool import FirestoreSpool # Local write-ahead spool for crowd data writes
 
-# Define some approximate Bengaluru locations for simulation
-bengaluru_locations = {
-    "MG Road": {"lat": 12.9750, "lon": 77.6090},
-    "Majestic Bus Stand": {"lat": 12.9774, "lon": 77.5700},
-    "Koramangala 5th Block": {"lat": 12.9345, "lon": 77.6180},
-    "Indiranagar 100 Feet Rd": {"lat": 12.9700, "lon": 77.6400},
-    "Electronic City": {"lat": 12.8468, "lon": 77.6601},
-    "Cubbon Park": {"lat": 12.9758, "lon": 77.5922},
-    "Marathahalli": {"lat": 12.9569, "lon": 77.7011},
-    "Kr puram": {"lat": 13.0170, "lon": 77.7044},
-    "Bhanashankari": {"lat": 12.9255, "lon": 77.5468},
-    "yeswanthpur": {"lat": 13.0250, "lon": 77.5340},
+# Readings are appended to a local spool and replayed to Firestore in the background
+spool = FirestoreSpool('sim_crowd_generator')
 
-    
-}
 
 def generate_single_crowd_data_point(location_name, coords):
     # Simulate density between 0.1 (low) and 1.0 (very high)
@@ -27,7 +16,7 @@ def generate_single_crowd_data_point(location_name, coords):
     lon_var = random.uniform(-0.005, 0.005)
 
     data = {
-        'timestamp': firestore.SERVER_TIMESTAMP, # Firestore sets the actual server time
+        'timestamp': firestore.SERVER_TIMESTAMP, # The spool replaces this with the local time of the append
         'location_name': location_name,
         'latitude': coords['lat'] + lat_var,
         'longitude': coords['lon'] + lon_var,
@@ -39,14 +28,15 @@ def send_crowd_data_to_firestore():
     for name, coords in bengaluru_locations.items():
         data_point = generate_single_crowd_data_point(name, coords)
         try:
-            # Add data to 'crowd_data' collection
-            db.collection('crowd_data').add(data_point)
+            # Spool the reading for the 'crowd_data' collection
+            spool.add('crowd_data', data_point)
             print(f"Generated crowd data for {name}: Density {data_point['simulated_density']:.2f}")
         except Exception as e:
-            print(f"Error sending crowd data to Firestore for {name}: {e}")
+            print(f"Error spooling crowd data for {name}: {e}")
 
 if __name__ == "__main__":
     print("Starting simulated crowd data generation...")
+    spool.start()
     while True:
         send_crowd_data_to_firestore()
         time.sleep(5) # Generate new data for all locations every 5 seconds
\ No newline at end of file
@@ -7,21 +7,8 @@ import time
 import random
 from firestore_connector import db # Import Firestore client
 from firebase_admin import firestore # Required for firestore.SERVER_TIMESTAMP
+from city_locations import bengaluru_locations # Shared with the ingest gateway
 
-# Define some approximate Bengaluru locations with their latitude and longitude.
-# This dictionary is used to get coordinates for the social media posts.
-bengaluru_locations = {
-    "MG Road": {"lat": 12.9750, "lon": 77.6090},
-    "Majestic Bus Stand": {"lat": 12.9774, "lon": 77.5700},
-    "Koramangala 5th Block": {"lat": 12.9345, "lon": 77.6180},
-    "Indiranagar 100 Feet Rd": {"lat": 12.9700, "lon": 77.6400},
-    "Electronic City": {"lat": 12.8468, "lon": 77.6601},
-    "Cubbon Park": {"lat": 12.9758, "lon": 77.5922},
-    "Marathahalli": {"lat": 12.9569, "lon": 77.7011},
-    "Kr puram": {"lat": 13.0170, "lon": 77.7044},
-    "Bhanashankari": {"lat": 12.9255, "lon": 77.5468},
-    "yeswanthpur": {"lat": 13.0250, "lon": 77.5340}
-}
 
 # A list of mock social media post templates.
 # The [LOCATION] placeholder will be replaced with a random location name.
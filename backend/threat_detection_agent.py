@@ -2,6 +2,8 @@ import time
 from firestore_connector import db # Import Firestore client
 from firebase_admin import firestore # Required for firestore.SERVER_TIMESTAMP
 from google.cloud.firestore import FieldFilter # To filter documents
+from firestore_records import THREAT_CROWD_FIELDS, decode_crowd_reading # Projected, slotted crowd records
+from firestore_spool import FirestoreSpool # Local write-ahead spool for alert writes
 
 from twilio.rest import Client # For sending SMS alerts
 import os
@@ -33,7 +35,11 @@ DENSITY_THRESHOLD_MEDIUM = 0.6 # Medium density, warning
 
 ALERT_COOLDOWN_SECONDS = 60 * 2 # Don't send alerts for the same location too often (2 minutes)
 
-# Dictionary to keep track of the last time an alert was sent for a location
+# Alerts are appended to a local spool and replayed to Firestore in the background,
+# so a slow or unavailable Firestore never stalls the detection loop or loses an alert.
+spool = FirestoreSpool('threat_detection_agent')
+
+# Dictionary to keep track of the last time an alert was sent for a location (keyed by interned location ID)
 last_alert_time = {}
 
 def send_sms_alert(to_number, from_number, message_body):
@@ -56,21 +62,22 @@ def check_for_threats():
     # Get the latest crowd data for each location
     # For simplicity, we'll fetch the last 20 data points and find the latest for each unique location
     # A more robust solution might query specific locations or use Firestore triggers
-    docs = db.collection('crowd_data').order_by('timestamp', direction=firestore.Query.DESCENDING).limit(20).stream()
+    # Only the fields used below are fetched, and each snapshot is decoded into a CrowdReading.
+    docs = db.collection('crowd_data').select(THREAT_CROWD_FIELDS).order_by('timestamp', direction=firestore.Query.DESCENDING).limit(20).stream()
 
     latest_data_by_location = {}
     for doc in docs:
-        data = doc.to_dict()
-        loc_name = data.get('location_name')
-        if loc_name and loc_name not in latest_data_by_location:
-            latest_data_by_location[loc_name] = data
+        reading = decode_crowd_reading(doc)
+        if reading.location_id is not None and reading.location_id not in latest_data_by_location:
+            latest_data_by_location[reading.location_id] = reading
 
-    for loc_name, data in latest_data_by_location.items():
-        density = data.get('simulated_density', 0)
+    for location_id, reading in latest_data_by_location.items():
+        loc_name = reading.location_name
+        density = reading.density
         current_unix_time = time.time() # Current time in seconds since epoch
 
         # Check if this location is in cooldown period
-        if loc_name in last_alert_time and (current_unix_time - last_alert_time[loc_name]) < ALERT_COOLDOWN_SECONDS:
+        if location_id in last_alert_time and (current_unix_time - last_alert_time[location_id]) < ALERT_COOLDOWN_SECONDS:
             print(f"Location {loc_name} is in cooldown. Skipping alert check.")
             continue # Skip if an alert was recently sent for this location
 
@@ -89,16 +96,16 @@ def check_for_threats():
             alert_data = {
                 'timestamp': firestore.SERVER_TIMESTAMP,
                 'location_name': loc_name,
-                'latitude': data.get('latitude'),
-                'longitude': data.get('longitude'),
+                'latitude': reading.latitude,
+                'longitude': reading.longitude,
                 'threat_type': 'Crowd Density Alert',
                 'threat_level': threat_level,
                 'details': alert_details
             }
             try:
-                db.collection('threat_alerts').add(alert_data)
+                spool.add('threat_alerts', alert_data)
                 print(f"🚨 ALERT for {loc_name}: {threat_level} - Density: {density:.2f}")
-                last_alert_time[loc_name] = current_unix_time # Update last alert time for this location
+                last_alert_time[location_id] = current_unix_time # Update last alert time for this location
 
                 # Send SMS for HIGH level threats
                 if threat_level == "HIGH" and recipient_phone_number and twilio_phone_number:
@@ -106,10 +113,11 @@ def check_for_threats():
                     send_sms_alert(recipient_phone_number, twilio_phone_number, sms_message)
 
             except Exception as e:
-                print(f"Error adding threat alert to Firestore for {loc_name}: {e}")
+                print(f"Error spooling threat alert for {loc_name}: {e}")
 
 if __name__ == "__main__":
     print("Starting threat detection agent...")
+    spool.start()
     while True:
         check_for_threats()
         time.sleep(5) # Check for threats every 5 seconds
\ No newline at end of file
@@ -6,8 +6,20 @@ import React, { useState, useEffect } from 'react';
 import { doc, onSnapshot } from "firebase/firestore";
 import { db } from '../firebaseConfig'; // Import the Firestore database instance
 
+// Builds a srcset from the resized variants written by the backend updater
+// (thumbnail / panel / full), so the browser downloads the smallest one that fits.
+const buildSrcSet = (variants) => {
+  if (!variants) return undefined;
+  return Object.values(variants)
+    .filter((variant) => variant && variant.url && variant.width)
+    .sort((a, b) => a.width - b.width)
+    .map((variant) => `${variant.url} ${variant.width}w`)
+    .join(', ');
+};
+
 const CameraFeed = () => {
   const [imageUrl, setImageUrl] = useState(''); // State to store the current image URL
+  const [imageSrcSet, setImageSrcSet] = useState(undefined); // State to store the responsive variant URLs
   const [locationName, setLocationName] = useState(''); // State to store the camera's location name
   const [loading, setLoading] = useState(true); // State to indicate if the feed is loading
 
@@ -24,13 +36,15 @@ const CameraFeed = () => {
         // If the document exists, extract the data and update the component's state.
         const data = docSnap.data();
         console.log(data);
-        setImageUrl(data.image_url); // This is where the image URL is read
+        setImageUrl(data.image_url); // This is where the image URL is read (full-size JPEG fallback)
+        setImageSrcSet(buildSrcSet(data.image_variants) || undefined);
         setLocationName(data.location_name || 'Simulated Camera'); // Use a fallback name
         setLoading(false); // Loading is complete
       } else {
         // If the document does not exist, log a message and clear the image.
         console.log("No camera feed data found for 'main_alert_camera_feed'. Please ensure backend updater is running and writing to this ID.");
         setImageUrl(''); // Clear the image if no data
+        setImageSrcSet(undefined);
         setLoading(false); // Loading is complete even if there's an error
       }
     }, (error) => {
@@ -57,6 +71,8 @@ const CameraFeed = () => {
         ) : imageUrl ? (
           <img
             src={imageUrl}
+            srcSet={imageSrcSet}
+            sizes="(max-width: 768px) 100vw, 50vw"
             alt={`Simulated camera feed from ${locationName}`}
             class="camera-feed-image"
           />